@@ -0,0 +1,36 @@
+import os
+
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+
+
+def _worker_schema():
+    """Name of the schema for the current pytest-xdist worker, None when not distributed"""
+    worker_id = os.environ.get('PYTEST_XDIST_WORKER')
+    return f'test_{worker_id}' if worker_id else None
+
+
+def pytest_configure(config):
+    # Every xdist worker gets its own schema, so the workers can create,
+    # truncate and drop tables without stepping on each other
+    schema = _worker_schema()
+    uri = os.environ.get('TP_DATABASE_URI')
+    if schema is None or uri is None:
+        return
+
+    with psycopg.connect(uri, autocommit=True) as conn:
+        conn.execute(sql.SQL('CREATE SCHEMA IF NOT EXISTS {}').format(sql.Identifier(schema)))
+
+    os.environ['TP_DATABASE_URI_BASE'] = uri
+    os.environ['TP_DATABASE_URI'] = make_conninfo(uri, options=f'-c search_path={schema}')
+
+
+def pytest_unconfigure(config):
+    schema = _worker_schema()
+    uri = os.environ.get('TP_DATABASE_URI_BASE')
+    if schema is None or uri is None:
+        return
+
+    with psycopg.connect(uri, autocommit=True) as conn:
+        conn.execute(sql.SQL('DROP SCHEMA IF EXISTS {} CASCADE').format(sql.Identifier(schema)))
@@ -96,8 +96,7 @@ class ItemListsTestCase(unittest.TestCase):
         cls.user2_headers = {'Authorization': f'Bearer {data["token"]}'}
 
     def tearDown(self):
-        db.truncate_table('lists_items')
-        db.truncate_table('item_lists')
+        db.truncate_table('lists_items', 'item_lists')
 
     @classmethod
     def tearDownClass(cls):
@@ -1,7 +1,8 @@
-import json
 import unittest
 from uuid import uuid4
 
+import orjson
+
 from turplanlegger.app import create_app, db
 from turplanlegger.auth.utils import hash_password
 from turplanlegger.models.user import User
@@ -16,6 +17,7 @@ class NotesTestCase(unittest.TestCase):
             'SECRET_KEY_ID': 'test',
             'LOG_LEVEL': 'INFO',
             'CREATE_ADMIN_USER': True,
+            'NOTE_CACHE_TTL': 60,
         }
 
         cls.app = create_app(config)
@@ -51,15 +53,20 @@ class NotesTestCase(unittest.TestCase):
             'name': 'Best note ever',
         }
 
+        # Request bodies are encoded once for the whole class
+        cls.note_full_json = orjson.dumps(cls.note_full)
+        cls.note_full2_json = orjson.dumps(cls.note_full2)
+        cls.note_no_content_json = orjson.dumps(cls.note_no_content)
+
         response = cls.client.post(
             '/login',
-            data=json.dumps({'email': cls.user1.email, 'password': 'test'}),
+            data=orjson.dumps({'email': cls.user1.email, 'password': 'test'}),
             headers={'Content-type': 'application/json'},
         )
         if response.status_code != 200:
             raise RuntimeError('Failed to login')
 
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
 
         cls.headers_json = {'Content-type': 'application/json', 'Authorization': f'Bearer {data["token"]}'}
         cls.headers = {'Authorization': f'Bearer {data["token"]}'}
@@ -72,44 +79,175 @@ class NotesTestCase(unittest.TestCase):
         db.destroy()
 
     def test_add_note_ok(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
 
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['owner'], self.user1.id)
         self.assertEqual(data['content'], 'Are er kul')
         self.assertEqual(data['name'], 'Best note ever')
 
+    def test_add_note_no_content(self):
+        response = self.client.post('/notes', data=self.note_no_content_json, headers=self.headers_json)
+        self.assertEqual(response.status_code, 400)
+
+        data = orjson.loads(response.data)
+        self.assertEqual(data['title'], 'Failed to parse note')
+        self.assertEqual(data['detail'], "Missing mandatory field 'content'")
+        self.assertEqual(data['type'], 'about:blank')
+        self.assertEqual(data['instance'], 'http://localhost/notes')
+
+    def test_add_note_content_not_str(self):
+        response = self.client.post('/notes', data=orjson.dumps({'content': 42}), headers=self.headers_json)
+        self.assertEqual(response.status_code, 400)
+
+        data = orjson.loads(response.data)
+        self.assertEqual(data['title'], 'Failed to parse note')
+        self.assertEqual(data['detail'], "'content' must be string")
+
     def test_get_note(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
 
         response = self.client.get(f'/notes/{data["id"]}', headers=self.headers)
         self.assertEqual(response.status_code, 200)
 
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['note']['owner'], self.user1.id)
         self.assertEqual(data['note']['content'], self.note_full['content'])
         self.assertEqual(data['note']['name'], self.note_full['name'])
 
+    def test_get_note_not_modified(self):
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
+        self.assertEqual(response.status_code, 201)
+        data = orjson.loads(response.data)
+
+        response = self.client.get(f'/notes/{data["id"]}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        etag = response.headers['ETag']
+
+        response = self.client.get(f'/notes/{data["id"]}', headers={**self.headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers['ETag'], etag)
+
+        # Proxies that compress the body weaken the tag, If-None-Match must still match
+        response = self.client.get(f'/notes/{data["id"]}', headers={**self.headers, 'If-None-Match': f'W/{etag}'})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.patch(
+            f'/notes/{data["id"]}/content', data=orjson.dumps({'content': 'newcontent'}), headers=self.headers_json
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f'/notes/{data["id"]}', headers={**self.headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        data = orjson.loads(response.data)
+        self.assertEqual(data['note']['content'], 'newcontent')
+
+    def test_get_note_cached_and_evicted(self):
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
+        self.assertEqual(response.status_code, 201)
+        note_id = orjson.loads(response.data)['id']
+
+        response = self.client.get(f'/notes/{note_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        # Changed behind the model's back, the cached row is still served
+        db.update_note_content(note_id, 'changed in database')
+        response = self.client.get(f'/notes/{note_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(orjson.loads(response.data)['note']['content'], self.note_full['content'])
+
+        # Writes read the row uncached and evict it
+        response = self.client.patch(
+            f'/notes/{note_id}/content', data=orjson.dumps({'content': 'newcontent'}), headers=self.headers_json
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f'/notes/{note_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(orjson.loads(response.data)['note']['content'], 'newcontent')
+
+        # A delete evicts it as well
+        response = self.client.delete(f'/notes/{note_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f'/notes/{note_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_note_cached_leading_zero(self):
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
+        self.assertEqual(response.status_code, 201)
+        note_id = orjson.loads(response.data)['id']
+
+        response = self.client.get(f'/notes/0{note_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.patch(
+            f'/notes/{note_id}/content', data=orjson.dumps({'content': 'newcontent'}), headers=self.headers_json
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f'/notes/0{note_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(orjson.loads(response.data)['note']['content'], 'newcontent')
+
+        response = self.client.delete(f'/notes/{note_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(f'/notes/0{note_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_note_cache_max_size(self):
+        max_size = self.app.config['NOTE_CACHE_MAX_SIZE']
+        self.addCleanup(self.app.config.__setitem__, 'NOTE_CACHE_MAX_SIZE', max_size)
+        self.app.config['NOTE_CACHE_MAX_SIZE'] = 1
+
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
+        self.assertEqual(response.status_code, 201)
+        first_id = orjson.loads(response.data)['id']
+        response = self.client.post('/notes', data=self.note_full2_json, headers=self.headers_json)
+        self.assertEqual(response.status_code, 201)
+        second_id = orjson.loads(response.data)['id']
+
+        response = self.client.get(f'/notes/{first_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        # Caching the second note pushes the first one out
+        response = self.client.get(f'/notes/{second_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        db.update_note_content(first_id, 'changed in database')
+        response = self.client.get(f'/notes/{first_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(orjson.loads(response.data)['note']['content'], 'changed in database')
+
+    def test_get_note_id_not_int(self):
+        response = self.client.get('/notes/abc', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+        data = orjson.loads(response.data)
+        self.assertEqual(data['title'], 'Note not found')
+
     def test_get_note_not_found(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
 
         response = self.client.get('/notes/2', headers=self.headers)
         self.assertEqual(response.status_code, 404)
 
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['title'], 'Note not found')
         self.assertEqual(data['detail'], 'The requested note was not found')
         self.assertEqual(data['type'], 'about:blank')
         self.assertEqual(data['instance'], 'http://localhost/notes/2')
 
     def test_delete_note(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         id = data['id']
 
         response = self.client.delete(f'/notes/{id}', headers=self.headers)
@@ -118,105 +256,121 @@ class NotesTestCase(unittest.TestCase):
         response = self.client.get(f'/notes/{id}', headers=self.headers)
         self.assertEqual(response.status_code, 404)
 
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['title'], 'Note not found')
         self.assertEqual(data['detail'], 'The requested note was not found')
         self.assertEqual(data['type'], 'about:blank')
         self.assertEqual(data['instance'], f'http://localhost/notes/{id}')
 
     def test_delete_note_not_found(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
 
         response = self.client.delete('/notes/2', headers=self.headers)
         self.assertEqual(response.status_code, 404)
 
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['title'], 'Note not found')
         self.assertEqual(data['detail'], 'The requested note was not found')
         self.assertEqual(data['type'], 'about:blank')
         self.assertEqual(data['instance'], 'http://localhost/notes/2')
 
     def test_change_note_owner(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
 
         response = self.client.patch(
-            f'/notes/{data["id"]}/owner', data=json.dumps({'owner': self.user2.id}), headers=self.headers_json
+            f'/notes/{data["id"]}/owner', data=orjson.dumps({'owner': self.user2.id}), headers=self.headers_json
         )
         self.assertEqual(response.status_code, 200)
 
         response = self.client.get(f'/notes/{data["id"]}', headers=self.headers)
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['note']['owner'], self.user2.id)
 
+    def test_change_note_owner_same_owner(self):
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
+        self.assertEqual(response.status_code, 201)
+        data = orjson.loads(response.data)
+
+        response = self.client.patch(
+            f'/notes/{data["id"]}/owner', data=orjson.dumps({'owner': self.user1.id}), headers=self.headers_json
+        )
+        self.assertEqual(response.status_code, 400)
+
+        data = orjson.loads(response.data)
+        self.assertEqual(data['title'], 'Failed to change owner of note')
+        self.assertEqual(data['detail'], 'new owner is same as old')
+
     def test_change_note_owner_note_not_found(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
 
         response = self.client.patch(
-            '/notes/2/owner', data=json.dumps({'owner': self.user2.id}), headers=self.headers_json
+            '/notes/2/owner', data=orjson.dumps({'owner': self.user2.id}), headers=self.headers_json
         )
         self.assertEqual(response.status_code, 404)
 
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['title'], 'Note not found')
         self.assertEqual(data['detail'], 'The requested note was not found')
         self.assertEqual(data['type'], 'about:blank')
         self.assertEqual(data['instance'], 'http://localhost/notes/2/owner')
 
     def test_change_note_owner_no_owner_given(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
 
-        response = self.client.patch('/notes/1/owner', data=json.dumps({}), headers=self.headers_json)
+        response = self.client.patch('/notes/1/owner', data=orjson.dumps({}), headers=self.headers_json)
         self.assertEqual(response.status_code, 400)
 
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['title'], 'Owner is not int')
         self.assertEqual(data['detail'], 'Owner must be passed as an str')
         self.assertEqual(data['type'], 'about:blank')
         self.assertEqual(data['instance'], 'http://localhost/notes/1/owner')
 
     def test_rename_note(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
 
-        response = self.client.patch('/notes/1/rename', data=json.dumps({'name': 'newlist'}), headers=self.headers_json)
+        response = self.client.patch(
+            '/notes/1/rename', data=orjson.dumps({'name': 'newlist'}), headers=self.headers_json
+        )
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['status'], 'ok')
 
     def test_update_note_content(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
 
         response = self.client.patch(
-            '/notes/1/content', data=json.dumps({'content': 'newcontent'}), headers=self.headers_json
+            '/notes/1/content', data=orjson.dumps({'content': 'newcontent'}), headers=self.headers_json
         )
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['status'], 'ok')
 
     def test_update_note(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         note_id = data['id']
 
         response = self.client.put(
             f'/notes/{note_id}',
-            data=json.dumps({'name': 'newname', 'content': 'newcontent'}),
+            data=orjson.dumps({'name': 'newname', 'content': 'newcontent'}),
             headers=self.headers_json,
         )
 
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
 
         self.assertEqual(data['status'], 'ok')
         self.assertEqual(data['count'], 1)
@@ -224,96 +378,96 @@ class NotesTestCase(unittest.TestCase):
         self.assertEqual(data['note']['content'], 'newcontent')
 
     def test_update_note_fail_no_change(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         note_id = data['id']
 
         response = self.client.put(
             f'/notes/{note_id}',
-            data=json.dumps({'name': self.note_full['name'], 'content': self.note_full['content']}),
+            data=orjson.dumps({'name': self.note_full['name'], 'content': self.note_full['content']}),
             headers=self.headers_json,
         )
 
         self.assertEqual(response.status_code, 409)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['title'], 'Failed to update note')
         self.assertEqual(data['detail'], 'No new updates were provided')
 
     def test_update_empty(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         note_id = data['id']
 
         response = self.client.put(
-            f'/notes/{note_id}', data=json.dumps({'name': None, 'content': None}), headers=self.headers_json
+            f'/notes/{note_id}', data=orjson.dumps({'name': None, 'content': None}), headers=self.headers_json
         )
 
         self.assertEqual(response.status_code, 409)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['title'], 'Failed to update note')
         self.assertEqual(data['detail'], 'Field content can not be empty')
 
     def test_update_content(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         note_id = data['id']
 
         response = self.client.put(
             f'/notes/{note_id}',
-            data=json.dumps({'name': 'It now has a new name', 'content': self.note_full['content']}),
+            data=orjson.dumps({'name': 'It now has a new name', 'content': self.note_full['content']}),
             headers=self.headers_json,
         )
 
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['note']['name'], 'It now has a new name')
         self.assertEqual(data['note']['content'], self.note_full['content'])
 
     def test_update_note_empty_content_update(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         note_id = data['id']
 
         response = self.client.put(
-            f'/notes/{note_id}', data=json.dumps({'name': self.note_full['name']}), headers=self.headers_json
+            f'/notes/{note_id}', data=orjson.dumps({'name': self.note_full['name']}), headers=self.headers_json
         )
 
         self.assertEqual(response.status_code, 409)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['title'], 'Failed to update note')
         self.assertEqual(data['detail'], 'Field content can not be empty')
 
     def test_update_name(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         note_id = data['id']
 
         response = self.client.put(
             f'/notes/{note_id}',
-            data=json.dumps({'name': self.note_full['name'], 'content': 'It now has new content'}),
+            data=orjson.dumps({'name': self.note_full['name'], 'content': 'It now has new content'}),
             headers=self.headers_json,
         )
 
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['note']['name'], self.note_full['name'])
         self.assertEqual(data['note']['content'], 'It now has new content')
 
     def test_get_my_note(self):
-        response = self.client.post('/notes', data=json.dumps(self.note_full), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
-        response = self.client.post('/notes', data=json.dumps(self.note_full2), headers=self.headers_json)
+        response = self.client.post('/notes', data=self.note_full2_json, headers=self.headers_json)
         self.assertEqual(response.status_code, 201)
 
         response = self.client.get('/notes/mine', headers=self.headers)
         self.assertEqual(response.status_code, 200)
 
-        data = json.loads(response.data.decode('utf-8'))
+        data = orjson.loads(response.data)
         self.assertEqual(data['note'][0]['owner'], self.user1.id)
         self.assertEqual(data['note'][0]['content'], self.note_full['content'])
         self.assertEqual(data['note'][0]['name'], self.note_full['name'])
@@ -131,15 +131,17 @@ class TripsTestCase(unittest.TestCase):
         cls.headers = {'Authorization': f'Bearer {data["token"]}'}
 
     def tearDown(self):
-        db.truncate_table('trips')
-        db.truncate_table('trip_dates')
-        db.truncate_table('routes')
-        db.truncate_table('item_lists')
-        db.truncate_table('lists_items')
-        db.truncate_table('notes')
-        db.truncate_table('trips_notes_references')
-        db.truncate_table('trips_routes_references')
-        db.truncate_table('trips_item_lists_references')
+        db.truncate_table(
+            'trips',
+            'trip_dates',
+            'routes',
+            'item_lists',
+            'lists_items',
+            'notes',
+            'trips_notes_references',
+            'trips_routes_references',
+            'trips_item_lists_references',
+        )
 
     @classmethod
     def tearDownClass(cls):
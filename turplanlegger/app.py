@@ -7,6 +7,7 @@ from turplanlegger.exceptions import ExceptionHandlers
 from turplanlegger.utils.config import Config
 from turplanlegger.utils.cors import Cors
 from turplanlegger.utils.http_client import HttpClient
+from turplanlegger.utils.json_provider import OrjsonProvider
 from turplanlegger.utils.logger import Logger
 
 handlers = ExceptionHandlers()
@@ -19,6 +20,7 @@ http_client = HttpClient()
 
 def create_app(config_override: Dict[str, Any] = None, environment: str = None) -> Flask:
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     app.config['ENVIRONMENT'] = environment
     config.init_app(app, config_override)
 
@@ -7,6 +7,8 @@ from psycopg.rows import namedtuple_row
 class Database:
     def __init__(self, app=None):
         self.app = None
+        # Called after tables are truncated or dropped, lets models clear their caches
+        self.reset_callbacks = []
         if app:
             self.init_db
 
@@ -79,10 +81,17 @@ class Database:
                 'trips_item_lists_references',
             ]:
                 self.cur.execute(psycopg.sql.SQL('DROP TABLE IF EXISTS {} CASCADE'.format(table)))
+        self._reset()
 
-    def truncate_table(self, table: str):
+    def truncate_table(self, *tables: str):
+        # All tables are truncated by a single statement
         with self.conn.transaction():
-            self.cur.execute(psycopg.sql.SQL('TRUNCATE TABLE {} RESTART IDENTITY CASCADE'.format(table)))
+            self.cur.execute(
+                psycopg.sql.SQL('TRUNCATE TABLE {} RESTART IDENTITY CASCADE').format(
+                    psycopg.sql.SQL(', ').join(map(psycopg.sql.Identifier, tables))
+                )
+            )
+        self._reset()
 
     # Item List
 
@@ -279,7 +288,7 @@ class Database:
             VALUES (%(owner)s, %(name)s, %(content)s)
             RETURNING *
         """
-        return self._insert(insert, vars(note))
+        return self._insert(insert, {'owner': note.owner, 'name': note.name, 'content': note.content})
 
     def update_note(self, note, updated_fields=None):
         update = 'UPDATE notes SET update_time=CURRENT_TIMESTAMP'
@@ -293,7 +302,7 @@ class Database:
             update += ', content=%(content)s'
 
         update += ' WHERE id=%(id)s RETURNING *'
-        return self._updateone(update, vars(note), returning=True)
+        return self._updateone(update, {'id': note.id, 'name': note.name, 'content': note.content}, returning=True)
 
     def delete_note(self, id):
         update = """
@@ -613,6 +622,10 @@ class Database:
             self.cur.execute(query, vars)
             return self.cur.fetchone() if returning else None
 
+    def _reset(self):
+        for callback in self.reset_callbacks:
+            callback()
+
     def _log(self, func_name, query, vars):
         self.logger.debug(
             '\n{stars} {func_name} {stars}\n{query}'.format(
@@ -1,31 +1,110 @@
-from typing import Dict
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Optional, Tuple, TypedDict
 
-from flask import g
+from flask import current_app, g
 
 from turplanlegger.app import db
+from turplanlegger.utils.json_provider import dumpb
 
-JSON = Dict[str, any]
+
+class NotePayload(TypedDict, total=False):
+    """JSON shape of a Note, 'content' is the only field required in input"""
+
+    id: int
+    owner: str
+    name: Optional[str]
+    content: str
+    create_time: datetime
+
+
+# Note rows by id, with the monotonic time they expire at, least recently used
+# first. Rows are immutable, so a cached row is never changed by a request
+# holding the Note built from it. The epoch is bumped on every eviction, a
+# lookup only stores the row it read if no eviction happened while it was reading.
+_note_cache: 'OrderedDict[int, Tuple[float, Any]]' = OrderedDict()
+_note_cache_epoch = 0
+_note_cache_lock = threading.Lock()
+
+
+def _evict(id: int) -> None:
+    global _note_cache_epoch
+    with _note_cache_lock:
+        _note_cache_epoch += 1
+        _note_cache.pop(id, None)
+
+
+def _clear_cache() -> None:
+    global _note_cache_epoch
+    with _note_cache_lock:
+        _note_cache_epoch += 1
+        _note_cache.clear()
+
+
+db.reset_callbacks.append(_clear_cache)
+
+
+def _payload(id, owner, name, content, create_time) -> NotePayload:
+    # The single definition of a Note's JSON shape
+    return {
+        'id': id,
+        'owner': owner,
+        'name': name,
+        'content': content,
+        'create_time': create_time,
+    }
 
 
 class Note:
-    def __init__(self, owner: str, content: str, **kwargs) -> None:
-        if not owner:
-            raise ValueError("Missing mandatory field 'owner'")
-        if not isinstance(owner, str):
+    __slots__ = (
+        'id',
+        'owner',
+        'content',
+        'name',
+        'create_time',
+        'update_time',
+        'deleted',
+        'delete_time',
+        '_payload',
+        '_cached_json',
+    )
+
+    def __init__(
+        self,
+        owner: str,
+        content: str,
+        *,
+        id: int = None,
+        name: str = None,
+        create_time: datetime = None,
+        update_time: datetime = None,
+        deleted: bool = None,
+        delete_time: datetime = None,
+    ) -> None:
+        # Valid input passes with one check per field
+        if type(owner) is not str or not owner:
+            if not owner:
+                raise ValueError("Missing mandatory field 'owner'")
             raise TypeError("'owner' must be str")
-        if not content:
-            raise ValueError("Missing mandatory field 'content'")
-        if not isinstance(content, str):
+        if type(content) is not str or not content:
+            if not content:
+                raise ValueError("Missing mandatory field 'content'")
             raise TypeError("'content' must be string")
 
-        self.owner = owner
+        # Interned, so the Notes of one owner share a single string
+        self.owner = sys.intern(owner)
         self.content = content
-        self.id = kwargs.get('id', None)
-        self.name = kwargs.get('name', None)
-        self.create_time = kwargs.get('create_time', None)
-        self.update_time = kwargs.get('update_time', None)
-        self.deleted = kwargs.get('deleted', None)
-        self.delete_time = kwargs.get('delete_time', None)
+        self.id = id
+        self.name = name
+        self.create_time = create_time
+        self.update_time = update_time
+        self.deleted = deleted
+        self.delete_time = delete_time
+        self._payload = _payload(self.id, self.owner, self.name, self.content, self.create_time)
+        self._cached_json = None
 
     def __repr__(self):
         return (
@@ -36,7 +115,7 @@ class Note:
         )
 
     @classmethod
-    def parse(cls, json: JSON) -> 'Note':
+    def parse(cls, json: NotePayload) -> 'Note':
         return Note(
             id=json.get('id', None),
             owner=g.user.id,
@@ -45,57 +124,155 @@ class Note:
         )
 
     @property
-    def serialize(self) -> JSON:
-        return {
-            'id': self.id,
-            'owner': self.owner,
-            'name': self.name,
-            'content': self.content,
-            'create_time': self.create_time,
-        }
-
-    def create(self) -> 'Note':
-        note = self.get_note(db.create_note(self))
-        return note
+    def serialize(self) -> NotePayload:
+        return self._payload
+
+    @staticmethod
+    def serialize_row(rec) -> bytes:
+        return dumpb(_payload(rec.id, rec.owner, rec.name, rec.content, rec.create_time))
+
+    def to_json_bytes(self) -> bytes:
+        if self._cached_json is None:
+            self._cached_json = dumpb(self.serialize)
+        return self._cached_json
+
+    def create_json(self) -> bytes:
+        # For callers that only need the response, no Note is built from the row
+        return self.serialize_row(db.create_note(self))
 
     def update(self, updated_fields) -> 'Note':
-        return db.update_note(self, updated_fields)
+        self._payload['name'] = self.name
+        self._payload['content'] = self.content
+        self._cached_json = None
+        updated = db.update_note(self, updated_fields)
+        _evict(self.id)
+        return updated
 
     def delete(self) -> bool:
-        return db.delete_note(self.id)
+        deleted = db.delete_note(self.id)
+        _evict(self.id)
+        return deleted
 
     def rename(self) -> 'Note':
-        return db.rename_note(self.id, self.name)
+        self._payload['name'] = self.name
+        self._cached_json = None
+        renamed = db.rename_note(self.id, self.name)
+        _evict(self.id)
+        return renamed
 
     def update_content(self) -> 'Note':
-        return db.update_note_content(self.id, self.content)
+        self._payload['content'] = self.content
+        self._cached_json = None
+        updated = db.update_note_content(self.id, self.content)
+        _evict(self.id)
+        return updated
 
     @staticmethod
     def find_note(id: int) -> 'Note':
         return Note.get_note(db.get_note(id))
 
     @staticmethod
-    def find_note_by_owner(owner_id: str) -> 'Note':
-        return [Note.get_note(note) for note in db.get_note_by_owner(owner_id)]
+    def find_note_cached(id: int | str) -> 'Note':
+        """Like find_note, but may return a row up to NOTE_CACHE_TTL seconds old
+
+        The cache is per process, only use this for reads.
+        Returns None if id is not an integer.
+        """
+        # Key on the int, the database reads '01' and '1' as the same row
+        try:
+            key = int(id)
+        except (TypeError, ValueError):
+            return None
+
+        ttl = current_app.config['NOTE_CACHE_TTL']
+        if ttl <= 0:
+            return Note.find_note(key)
+
+        now = time.monotonic()
+
+        with _note_cache_lock:
+            cached = _note_cache.get(key)
+            if cached is not None:
+                if cached[0] > now:
+                    _note_cache.move_to_end(key)
+                else:
+                    del _note_cache[key]
+                    cached = None
+            epoch = _note_cache_epoch
+        if cached is not None:
+            return Note.get_note(cached[1])
+
+        rec = db.get_note(key)
+        with _note_cache_lock:
+            if rec is not None and epoch == _note_cache_epoch:
+                _note_cache[key] = (now + ttl, rec)
+                _note_cache.move_to_end(key)
+                while len(_note_cache) > current_app.config['NOTE_CACHE_MAX_SIZE']:
+                    _note_cache.popitem(last=False)
+        return Note.get_note(rec)
+
+    @staticmethod
+    def find_note_by_owner(owner_id: str) -> list['Note']:
+        # get_note_by_owner fetches all rows in one round-trip
+        rows = db.get_note_by_owner(owner_id)
+        return [
+            Note._from_trusted(
+                rec.id,
+                rec.owner,
+                rec.content,
+                rec.name,
+                rec.create_time,
+                rec.update_time,
+                rec.deleted,
+                rec.delete_time,
+            )
+            for rec in rows
+        ]
 
     def change_owner(self, owner: str) -> 'Note':
+        # With both sides interned an equal owner is caught by the identity check in ==
+        if isinstance(owner, str):
+            owner = sys.intern(owner)
         if self.owner == owner:
             raise ValueError('new owner is same as old')
 
-        return Note.get_note(db.change_note_owner(self.id, owner))
+        note = Note.get_note(db.change_note_owner(self.id, owner))
+        _evict(self.id)
+
+        self.owner = owner
+        self._payload['owner'] = owner
+        self._cached_json = None
+
+        return note
 
     @classmethod
     def get_note(cls, rec) -> 'Note':
         if rec is None:
             return None
 
-        return Note(
-            id=rec.id,
-            owner=rec.owner,
-            name=rec.name,
-            content=rec.content,
-            create_time=rec.create_time,
-            update_time=rec.update_time,
-            deleted=rec.deleted,
-            delete_time=rec.delete_time,
+        return cls._from_trusted(
+            rec.id,
+            rec.owner,
+            rec.content,
+            rec.name,
+            rec.create_time,
+            rec.update_time,
+            rec.deleted,
+            rec.delete_time,
         )
+
+    @classmethod
+    def _from_trusted(cls, id, owner, content, name, create_time, update_time, deleted, delete_time) -> 'Note':
+        # Database rows are already validated, skip the checks in __init__
+        self = cls.__new__(cls)
+        self.id = id
+        self.owner = sys.intern(owner) if isinstance(owner, str) else owner
+        self.content = content
+        self.name = name
+        self.create_time = create_time
+        self.update_time = update_time
+        self.deleted = deleted
+        self.delete_time = delete_time
+        self._payload = _payload(self.id, self.owner, self.name, self.content, self.create_time)
+        self._cached_json = None
+        return self
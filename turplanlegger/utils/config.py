@@ -48,6 +48,13 @@ class Config:
         self.config['DATABASE_URI'] = self.conf_ent('DATABASE_URI', str)
         self.config['DATABASE_MAX_RETRIES'] = self.conf_ent('DATABASE_MAX_RETRIES', int, 5)
 
+        # Cache
+        # Seconds, 0 disables. The cache is per process, GET /notes/<id> can lag
+        # behind writes made through other workers by up to this long
+        self.config['NOTE_CACHE_TTL'] = self.conf_ent('NOTE_CACHE_TTL', int, 0)
+        # Most notes kept per process, the least recently used are dropped first
+        self.config['NOTE_CACHE_MAX_SIZE'] = self.conf_ent('NOTE_CACHE_MAX_SIZE', int, 1024)
+
         # Logging
         self.config['LOG_LEVEL'] = self.conf_ent('LOG_LEVEL', str, 'INFO')
         self.config['LOG_TO_FILE'] = self.conf_ent('LOG_TO_FILE', bool, False)
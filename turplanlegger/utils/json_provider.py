@@ -0,0 +1,42 @@
+import decimal
+from typing import Any
+
+import orjson
+from flask.json.provider import JSONProvider
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+
+    # orjson only handles exact tuples, database rows are namedtuples
+    if isinstance(o, tuple):
+        return list(o)
+
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+def dumpb(obj: Any, sort_keys: bool = True) -> bytes:
+    option = orjson.OPT_NAIVE_UTC
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson
+
+    Drop-in replacement for Flask's DefaultJSONProvider. Naive datetimes are
+    treated as UTC, same as Flask does, but are written as ISO 8601 strings.
+    """
+
+    sort_keys = True
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumpb(obj, self.sort_keys).decode('utf-8')
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
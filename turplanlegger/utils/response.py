@@ -1,6 +1,9 @@
+from typing import Any
 from urllib.parse import urljoin
 
-from flask import current_app, request
+from flask import Response, current_app, request
+
+from turplanlegger.utils.json_provider import dumpb
 
 
 def absolute_url(path: str = '') -> str:
@@ -9,3 +12,8 @@ def absolute_url(path: str = '') -> str:
     except Exception:
         base_url = '/'
     return urljoin(base_url + '/', path.lstrip('/')) if path else base_url
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """Build a JSON response from payload, encoded straight to bytes by orjson"""
+    return current_app.response_class(dumpb(payload), status=status, mimetype='application/json')
@@ -1,8 +1,11 @@
-from flask import g, jsonify, request
+from flask import g, make_response, request
+from orjson import Fragment
+from werkzeug.http import generate_etag
 
 from turplanlegger.auth.decorators import auth
 from turplanlegger.exceptions import ApiProblem
 from turplanlegger.models.note import Note
+from turplanlegger.utils.response import json_response
 
 from . import api
 
@@ -10,13 +13,22 @@ from . import api
 @api.route('/notes/<note_id>', methods=['GET'])
 @auth
 def get_note(note_id):
-    note = Note.find_note(note_id)
+    note = Note.find_note_cached(note_id)
 
-    if note:
-        return jsonify(status='ok', count=1, note=note.serialize)
-    else:
+    if not note:
         raise ApiProblem('Note not found', 'The requested note was not found', 404)
 
+    # Derived from the encoded note, so it is stable across workers
+    etag = generate_etag(note.to_json_bytes())
+
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = json_response({'status': 'ok', 'count': 1, 'note': Fragment(note.to_json_bytes())})
+
+    response.set_etag(etag)
+    return response
+
 
 @api.route('/notes/<note_id>', methods=['DELETE'])
 @auth
@@ -31,7 +43,7 @@ def delete_note(note_id):
     except Exception as e:
         raise ApiProblem('Failed to delete note', str(e), 500)
 
-    return jsonify(status='ok')
+    return json_response({'status': 'ok'})
 
 
 @api.route('/notes', methods=['POST'])
@@ -43,11 +55,11 @@ def add_note():
         raise ApiProblem('Failed to parse note', str(e), 400)
 
     try:
-        note = note.create()
+        note_json = note.create_json()
     except Exception as e:
         raise ApiProblem('Failed to create note', str(e), 500)
 
-    return jsonify(note.serialize), 201
+    return json_response(Fragment(note_json), 201)
 
 
 @api.route('/notes/<note_id>', methods=['PUT'])
@@ -78,7 +90,7 @@ def update_note(note_id):
     note.content = content
 
     if note.update(updated_fields):
-        return jsonify(status='ok', count=1, note=note.serialize)
+        return json_response({'status': 'ok', 'count': 1, 'note': Fragment(note.to_json_bytes())})
     else:
         raise ApiProblem('Failed to update note', 'Unknown error', 500)
 
@@ -103,7 +115,7 @@ def change_note_owner(note_id):
     except Exception as e:
         raise ApiProblem('Failed to change owner of note', str(e), 500)
 
-    return jsonify(status='ok')
+    return json_response({'status': 'ok'})
 
 
 @api.route('/notes/<note_id>/rename', methods=['PATCH'])
@@ -117,7 +129,7 @@ def rename_note(note_id):
     note.name = request.json.get('name', '')
 
     if note.rename():
-        return jsonify(status='ok')
+        return json_response({'status': 'ok'})
     else:
         raise ApiProblem('Failed to rename note', 'Unknown error', 500)
 
@@ -133,7 +145,7 @@ def update_note_content(note_id):
     note.content = request.json.get('content', '')
 
     if note.update_content():
-        return jsonify(status='ok')
+        return json_response({'status': 'ok'})
     else:
         raise ApiProblem('Failed to update note', 'Unknown error', 500)
 
@@ -144,6 +156,7 @@ def get_my_notes():
     notes = Note.find_note_by_owner(g.user.id)
 
     if notes:
-        return jsonify(status='ok', count=len(notes), note=[note.serialize for note in notes])
+        # Freshly loaded notes have nothing cached, encode the whole list in one pass
+        return json_response({'status': 'ok', 'count': len(notes), 'note': [note.serialize for note in notes]})
     else:
         raise ApiProblem('Note not found', 'No notes were found for the requested user', 404)